@@ -1,18 +1,39 @@
+import asyncio
+import io
+import json
 import logging
+import re
 import os
+import threading
+import time
+import zipfile
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Optional
+from email.utils import formatdate, parsedate_to_datetime
+from functools import lru_cache
+from typing import List, Optional
 from uuid import uuid4
 
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, BackgroundTasks
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, Response
+from fastapi.responses import FileResponse, RedirectResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from groq import Groq
 from dotenv import load_dotenv
 
-from utils import extract_text_from_pdf, clean_text, save_podcast_metadata, get_podcast_metadata
-from podcast_generator import generate_podcast_script, create_audio
+from utils import (
+    extract_text_from_pdf, clean_text, save_podcast_metadata,
+    compute_file_sha256, get_podcast_file_info, cache_podcast_url
+)
+from podcast_generator import (
+    generate_podcast_script, create_audio, parse_output_profiles, check_output_profiles, encode_renditions,
+    probe_ffmpeg, prewarm_tts, write_silent_audio
+)
+from retention import (
+    init_storage_index, compaction_loop, register_upload, discard_upload,
+    register_podcast, record_access, is_evicted
+)
+from artifact_store import get_artifact_store
+from job_queue import get_job_queue
 
 # Load environment variables
 load_dotenv()
@@ -28,11 +49,60 @@ if not GROQ_MODEL:
         "See https://console.groq.com/docs/deprecations for options."
     )
 
-# Initialize Groq client
-client = Groq(api_key=GROQ_API_KEY)
+# Optional warm-up hooks run in the background once the server is up,
+# e.g. PREWARM=ffmpeg,tts,llm (or "all"). Nothing is warmed by default.
+PREWARM = os.getenv("PREWARM", "")
+
+@lru_cache(maxsize=None)
+def get_groq_client():
+    """Create the Groq client on first use."""
+    from groq import Groq
+    return Groq(api_key=GROQ_API_KEY)
+
+async def prewarm_llm():
+    client = await asyncio.to_thread(get_groq_client)
+    # Any authenticated call opens the client's connection pool
+    await asyncio.to_thread(client.models.list)
+
+async def prewarm_ffmpeg():
+    await asyncio.to_thread(probe_ffmpeg)
+
+PREWARM_HOOKS = {
+    "ffmpeg": prewarm_ffmpeg,
+    "tts": prewarm_tts,
+    "llm": prewarm_llm,
+}
+
+async def run_prewarm_hooks(names: List[str]):
+    for name in names:
+        hook = PREWARM_HOOKS.get(name)
+        if not hook:
+            logger.warning(f"Unknown prewarm hook: {name}")
+            continue
+        try:
+            start = datetime.now()
+            await hook()
+            logger.info(f"Prewarmed {name} in {(datetime.now() - start).total_seconds():.2f}s")
+        except Exception as e:
+            logger.warning(f"Prewarm {name} failed: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Storage retention: index generated files and evict them in the background
+    init_storage_index()
+    compaction = asyncio.create_task(compaction_loop())
+    # Warm-up tasks only get the loop after startup completes, so they never delay readiness
+    names = list(PREWARM_HOOKS) if PREWARM.strip().lower() == "all" else [
+        name.strip().lower() for name in PREWARM.split(",") if name.strip()
+    ]
+    prewarm = asyncio.create_task(run_prewarm_hooks(names)) if names else None
+    yield
+    compaction.cancel()
+    if prewarm:
+        prewarm.cancel()
 
 # Initialize FastAPI app
-app = FastAPI(title="Podcast Generator API")
+app = FastAPI(title="Podcast Generator API", lifespan=lifespan)
 
 # Setup CORS
 app.add_middleware(
@@ -54,6 +124,32 @@ os.makedirs("metadata", exist_ok=True)
 
 # Store tasks in memory (in production, use a proper database)
 TASKS = {}
+BATCHES = {}
+# Worker mode: id of the worker (lease holder) running each task in this process
+TASK_OWNERS = {}
+
+# Shared worker pools: single and batch jobs draw from the same per-stage limits
+EXTRACT_SLOTS = asyncio.Semaphore(int(os.getenv("EXTRACT_WORKERS", 4)))
+LLM_SLOTS = asyncio.Semaphore(int(os.getenv("LLM_WORKERS", 4)))
+TTS_SLOTS = asyncio.Semaphore(int(os.getenv("TTS_WORKERS", 4)))
+MAX_BATCH_FILES = int(os.getenv("MAX_BATCH_FILES", 100))
+# Total uncompressed PDF bytes accepted in one batch, checked before zip entries are inflated
+MAX_BATCH_BYTES = int(float(os.getenv("MAX_BATCH_MB", 500)) * 1024 * 1024)
+
+# "inline" runs podcast jobs in this process; "queue" only enqueues them on the
+# shared job queue for worker.py processes, which may run on other nodes
+WORKER_MODE = os.getenv("WORKER_MODE", "inline").lower()
+QUEUE_MODE = WORKER_MODE == "queue"
+# Lifetime of download URLs for podcasts in a remote artifact store
+ARTIFACT_URL_SECONDS = int(os.getenv("ARTIFACT_URL_SECONDS", 3600))
+
+# Finished podcasts never change for a given task_id, so clients and CDNs may cache them
+PODCAST_CACHE_MAX_AGE = int(os.getenv("PODCAST_CACHE_MAX_AGE", 31536000))
+RANGE_CHUNK_SIZE = 64 * 1024
+
+# Comma-separated output profiles used when a request doesn't name any, e.g. "opus-32,mp3-64".
+# Empty keeps the edge-tts MP3 as-is without a final encode.
+DEFAULT_OUTPUT_PROFILE = os.getenv("OUTPUT_PROFILE", "")
 
 class PodcastStatus(BaseModel):
     status: str
@@ -61,6 +157,67 @@ class PodcastStatus(BaseModel):
     progress: Optional[float] = None
     audio_url: Optional[str] = None
 
+async def update_task(task_id: str, fields: dict):
+    """Update a task's status, publishing progress to the shared queue in worker mode.
+
+    Final statuses are left to the worker, which sets them with queue.finish once the
+    podcast is in the artifact store, so "completed" always means downloadable.
+    """
+    TASKS[task_id].update(fields)
+    if QUEUE_MODE and task_id in TASK_OWNERS and TASKS[task_id]["status"] == "processing":
+        # Ignored by the queue once another worker has taken the job over
+        status, worker_id = dict(TASKS[task_id]), TASK_OWNERS[task_id]
+        await asyncio.to_thread(lambda: get_job_queue().update_status(task_id, status, worker_id))
+
+async def get_task(task_id: str) -> Optional[dict]:
+    if QUEUE_MODE:
+        return await asyncio.to_thread(lambda: get_job_queue().get_status(task_id))
+    return TASKS.get(task_id)
+
+def enqueue_podcast(
+    task_id: str,
+    file_path: str,
+    model: str,
+    original_filename: str,
+    output_profiles: List[str],
+    batch_id: Optional[str] = None
+):
+    """Move a saved upload into the artifact store and queue it for a worker.
+
+    Blocking (artifact store and queue I/O); call it from a worker thread.
+    """
+    store = get_artifact_store()
+    store.put_file(file_path, file_path)
+    stored_path = store.local_path(file_path)
+    if not stored_path or os.path.abspath(stored_path) != os.path.abspath(file_path):
+        os.remove(file_path)
+        discard_upload(task_id)
+    status = {"status": "processing", "message": "Queued", "progress": 0.1}
+    if batch_id:
+        status.update({"batch_id": batch_id, "original_filename": original_filename})
+    get_job_queue().enqueue(
+        task_id,
+        {
+            "file_key": file_path,
+            "model": model,
+            "original_filename": original_filename,
+            "output_profiles": output_profiles
+        },
+        status,
+        batch_id
+    )
+
+async def resolve_output_profiles(output_profile: Optional[str]) -> List[str]:
+    """Parse requested output profiles, rejecting ones FFmpeg here cannot encode."""
+    try:
+        output_profiles = parse_output_profiles(output_profile or DEFAULT_OUTPUT_PROFILE)
+        # In queue mode the worker's FFmpeg encodes; a failure there fails the task
+        if output_profiles and not QUEUE_MODE:
+            await asyncio.to_thread(check_output_profiles, output_profiles)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return output_profiles
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -71,13 +228,15 @@ async def create_podcast(
     background_tasks: BackgroundTasks,
     pdf_file: UploadFile = File(...),
     model: Optional[str] = Form(None),
-    sync: bool = Form(False)
+    sync: bool = Form(False),
+    output_profile: Optional[str] = Form(None)
 ):
     # Use requested model or default from GROQ_MODEL
     model = model or GROQ_MODEL
     """Create a podcast from a PDF file"""
     if not pdf_file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="File must be a PDF")
+    output_profiles = await resolve_output_profiles(output_profile)
     
     task_id = str(uuid4())
     
@@ -87,6 +246,14 @@ async def create_podcast(
         with open(file_path, "wb") as f:
             content = await pdf_file.read()
             f.write(content)
+        await asyncio.to_thread(register_upload, task_id, file_path)
+        
+        if QUEUE_MODE:
+            # Worker mode: a worker.py process picks the job up from the shared queue
+            await asyncio.to_thread(enqueue_podcast, task_id, file_path, model, pdf_file.filename, output_profiles)
+            while sync and (await get_task(task_id))["status"] == "processing":
+                await asyncio.sleep(1)
+            return {"task_id": task_id}
         
         # Initialize task status
         TASKS[task_id] = {
@@ -101,7 +268,8 @@ async def create_podcast(
                 task_id,
                 file_path,
                 model,
-                pdf_file.filename
+                pdf_file.filename,
+                output_profiles
             )
         else:
             background_tasks.add_task(
@@ -109,100 +277,453 @@ async def create_podcast(
                 task_id,
                 file_path,
                 model,
-                pdf_file.filename
+                pdf_file.filename,
+                output_profiles
             )
         return {"task_id": task_id}
     except Exception as e:
         logger.error(f"Error in create_podcast: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
+@app.post("/create-podcast-batch")
+async def create_podcast_batch(
+    files: List[UploadFile] = File(...),
+    model: Optional[str] = Form(None),
+    output_profile: Optional[str] = Form(None)
+):
+    """Create podcasts from many PDF files (or zip archives of PDFs) as one batch"""
+    model = model or GROQ_MODEL
+    output_profiles = await resolve_output_profiles(output_profile)
+    pdfs = []
+    total_bytes = 0
+
+    def check_batch_limits(size: int):
+        # Runs before each file is kept (or inflated), so oversize batches never reach memory
+        if len(pdfs) >= MAX_BATCH_FILES:
+            raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_BATCH_FILES} files")
+        if total_bytes + size > MAX_BATCH_BYTES:
+            raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_BATCH_BYTES // (1024 * 1024)} MB")
+
+    for upload in files:
+        if not upload.filename.endswith(('.pdf', '.zip')):
+            raise HTTPException(status_code=400, detail=f"File must be a PDF or zip: {upload.filename}")
+        if upload.size is not None and upload.size > MAX_BATCH_BYTES:
+            raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_BATCH_BYTES // (1024 * 1024)} MB")
+        content = await upload.read()
+        if upload.filename.endswith('.pdf'):
+            check_batch_limits(len(content))
+            pdfs.append((upload.filename, content))
+            total_bytes += len(content)
+            continue
+        try:
+            with zipfile.ZipFile(io.BytesIO(content)) as archive:
+                for info in archive.infolist():
+                    name = os.path.basename(info.filename)
+                    if info.is_dir() or not name.endswith('.pdf') or info.filename.startswith('__MACOSX'):
+                        continue
+                    check_batch_limits(info.file_size)
+                    # Read at most the declared size so a lying header can't inflate further
+                    with archive.open(info) as entry:
+                        data = entry.read(info.file_size + 1)
+                    if len(data) > info.file_size:
+                        raise HTTPException(status_code=400, detail=f"Corrupt zip entry: {info.filename}")
+                    pdfs.append((name, data))
+                    total_bytes += len(data)
+        except zipfile.BadZipFile:
+            raise HTTPException(status_code=400, detail=f"Invalid zip archive: {upload.filename}")
+    if not pdfs:
+        raise HTTPException(status_code=400, detail="No PDF files found in upload")
+
+    batch_id = str(uuid4())
+    batch = {
+        "task_ids": [],
+        "jobs": {},
+        "cancelled": False,
+        "created_at": datetime.now().isoformat()
+    }
+    # In worker mode the shared queue is the batch record, so any API node can serve it
+    if not QUEUE_MODE:
+        BATCHES[batch_id] = batch
+    try:
+        for filename, content in pdfs:
+            task_id = str(uuid4())
+            file_path = f"uploads/{task_id}_{filename}"
+            with open(file_path, "wb") as f:
+                f.write(content)
+            await asyncio.to_thread(register_upload, task_id, file_path)
+            batch["task_ids"].append(task_id)
+            if QUEUE_MODE:
+                await asyncio.to_thread(enqueue_podcast, task_id, file_path, model, filename, output_profiles, batch_id)
+                continue
+            TASKS[task_id] = {
+                "status": "processing",
+                "message": "Queued",
+                "progress": 0.1,
+                "batch_id": batch_id,
+                "original_filename": filename
+            }
+            # Plain asyncio tasks (not BackgroundTasks) so the batch can be cancelled
+            job = asyncio.create_task(
+                process_podcast_creation(task_id, file_path, model, filename, output_profiles)
+            )
+            job.add_done_callback(
+                lambda job, task_id=task_id, file_path=file_path: _finish_batch_job(job, task_id, file_path)
+            )
+            batch["jobs"][task_id] = job
+        return {"batch_id": batch_id, "task_ids": batch["task_ids"]}
+    except Exception as e:
+        logger.error(f"Error in create_podcast_batch: {str(e)}", exc_info=True)
+        if batch["task_ids"]:
+            try:
+                await cancel_batch(batch_id)
+            except HTTPException:
+                pass
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+def _remove_upload(task_id: str, file_path: str):
+    if os.path.exists(file_path):
+        os.remove(file_path)
+    discard_upload(task_id)
+
+def _finish_batch_job(job: asyncio.Task, task_id: str, file_path: str):
+    # A job cancelled before it started never runs its own cleanup
+    if job.cancelled() and TASKS[task_id]["status"] == "processing":
+        TASKS[task_id].update({
+            "status": "cancelled",
+            "message": "Cancelled",
+            "progress": 0
+        })
+        # Done callbacks run on the event loop, so the index write goes to a thread
+        asyncio.get_running_loop().run_in_executor(None, _remove_upload, task_id, file_path)
+
+async def get_batch(batch_id: str) -> Optional[dict]:
+    """Task statuses, cancel flag and creation time of a batch."""
+    if QUEUE_MODE:
+        batch = await asyncio.to_thread(lambda: get_job_queue().get_batch(batch_id))
+        if batch:
+            batch["created_at"] = datetime.fromtimestamp(batch["created_at"]).isoformat()
+        return batch
+    batch = BATCHES.get(batch_id)
+    if not batch:
+        return None
+    return {
+        "tasks": {task_id: TASKS[task_id] for task_id in batch["task_ids"]},
+        "cancelled": batch["cancelled"],
+        "created_at": batch["created_at"]
+    }
+
+@app.get("/batch_status/{batch_id}")
+async def get_batch_status(batch_id: str):
+    batch = await get_batch(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    tasks = batch["tasks"]
+    counts = {}
+    for task in tasks.values():
+        counts[task["status"]] = counts.get(task["status"], 0) + 1
+    if counts.get("processing"):
+        status = "cancelling" if batch["cancelled"] else "processing"
+    elif batch["cancelled"]:
+        status = "cancelled"
+    elif counts.get("failed"):
+        status = "completed_with_errors"
+    else:
+        status = "completed"
+    progress = sum(task.get("progress") or 0 for task in tasks.values()) / len(tasks)
+    return {
+        "batch_id": batch_id,
+        "status": status,
+        "progress": progress,
+        "counts": counts,
+        "created_at": batch["created_at"],
+        "tasks": tasks
+    }
+
+@app.post("/cancel_batch/{batch_id}")
+async def cancel_batch(batch_id: str):
+    if QUEUE_MODE:
+        batch = await asyncio.to_thread(lambda: get_job_queue().get_batch(batch_id))
+        if not batch:
+            raise HTTPException(status_code=404, detail="Batch not found")
+        # Queued jobs are cancelled now, running ones by their worker
+        cancelled = await asyncio.to_thread(lambda: get_job_queue().request_cancel(list(batch["tasks"])))
+        return {"batch_id": batch_id, "cancelled": cancelled}
+    batch = BATCHES.get(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    batch["cancelled"] = True
+    cancelled = 0
+    for job in batch["jobs"].values():
+        if not job.done():
+            job.cancel()
+            cancelled += 1
+    return {"batch_id": batch_id, "cancelled": cancelled}
+
 @app.get("/podcast_status/{task_id}")
 async def get_podcast_status(task_id: str):
-    task = TASKS.get(task_id)
+    task = await get_task(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     return task
 
-@app.get("/get_podcast/{task_id}")
-async def get_podcast(task_id: str):
-    metadata = get_podcast_metadata(task_id)
-    if not metadata or metadata.get("status") != "completed":
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so ignore any W/ prefix
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+
+def _not_modified(request: Request, info: dict) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, info["etag"])
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(info["mtime"]) <= since
+    return False
+
+def _parse_range(range_header: str, size: int):
+    """Parse a single "bytes=" range; None means serve the whole file."""
+    match = re.fullmatch(r"\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*", range_header)
+    if not match:
+        # Malformed or multi-range requests get the full file
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        length = int(end)
+        if length == 0:
+            raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+def _iter_file_range(path: str, start: int, end: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            data = f.read(min(RANGE_CHUNK_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+# HEAD lets players and CDNs revalidate and discover range support without a body
+@app.api_route("/get_podcast/{task_id}", methods=["GET", "HEAD"])
+async def get_podcast(task_id: str, request: Request, profile: Optional[str] = None):
+    if is_evicted(task_id):
+        raise HTTPException(status_code=410, detail="Podcast has expired and was removed")
+    info = await asyncio.to_thread(get_podcast_file_info, task_id, profile)
+    if not info and QUEUE_MODE:
+        # Produced by a worker node; evicted by a compacting worker, or never finished
+        info = await asyncio.to_thread(_resolve_worker_podcast, task_id, profile)
+        if not info and await asyncio.to_thread(is_evicted, task_id, True):
+            raise HTTPException(status_code=410, detail="Podcast has expired and was removed")
+    if not info:
         raise HTTPException(status_code=404, detail="Podcast not found or not completed")
-    audio_path = metadata.get("output_path")
-    if not audio_path or not os.path.exists(audio_path):
-        raise HTTPException(status_code=404, detail="Audio file not found")
-    return FileResponse(audio_path, media_type="audio/mpeg", filename=os.path.basename(audio_path))
+    record_access(task_id)
+    if "url" in info:
+        return RedirectResponse(info["url"], status_code=307)
+    headers = {
+        "ETag": info["etag"],
+        "Last-Modified": formatdate(info["mtime"], usegmt=True),
+        "Cache-Control": f"public, max-age={PODCAST_CACHE_MAX_AGE}, immutable",
+        "Accept-Ranges": "bytes"
+    }
+    if _not_modified(request, info):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # A stale If-Range validator means the client must get the whole file again
+    if range_header and (not if_range or if_range.strip() in (info["etag"], headers["Last-Modified"])):
+        byte_range = _parse_range(range_header, info["size"])
+        if byte_range:
+            start, end = byte_range
+            headers.update({
+                "Content-Range": f"bytes {start}-{end}/{info['size']}",
+                "Content-Length": str(end - start + 1)
+            })
+            if request.method == "HEAD":
+                return Response(status_code=206, media_type=info["media_type"], headers=headers)
+            return StreamingResponse(
+                _iter_file_range(info["path"], start, end),
+                status_code=206,
+                media_type=info["media_type"],
+                headers=headers
+            )
+    return FileResponse(
+        info["path"],
+        media_type=info["media_type"],
+        filename=os.path.basename(info["path"]),
+        headers=headers
+    )
+
+def _resolve_worker_podcast(task_id: str, profile: Optional[str]) -> Optional[dict]:
+    """Find a worker-produced podcast in the artifact store (blocking).
+
+    On a shared volume the podcast is served like a local one, from metadata pointed at
+    the volume and kept only in the file cache. For remote stores the download URL is cached.
+    """
+    store = get_artifact_store()
+    data = store.get_bytes(os.path.join("metadata", f"{task_id}.json"))
+    if not data:
+        return None
+    metadata = json.loads(data)
+    output_path = metadata.get("output_path")
+    if output_path and store.local_path(output_path):
+        metadata["output_path"] = store.local_path(output_path)
+        for rendition in metadata.get("renditions", {}).values():
+            rendition["path"] = store.local_path(rendition["path"])
+        return get_podcast_file_info(task_id, profile, metadata)
+    if metadata.get("status") != "completed":
+        return None
+    key = metadata.get("renditions", {}).get(profile, {}).get("path") if profile else output_path
+    if not key:
+        return None
+    url = store.url(key, expires=ARTIFACT_URL_SECONDS)
+    # Stop handing the URL out well before it expires
+    return cache_podcast_url(task_id, profile, url, time.time() + ARTIFACT_URL_SECONDS / 2)
 
 # Legacy endpoints for backward compatibility
 @app.get("/podcast/{task_id}/status")
 async def legacy_get_podcast_status(task_id: str):
     return await get_podcast_status(task_id)
 
-@app.get("/podcast/{task_id}")
-async def legacy_get_podcast(task_id: str):
-    return await get_podcast(task_id)
+@app.api_route("/podcast/{task_id}", methods=["GET", "HEAD"])
+async def legacy_get_podcast(task_id: str, request: Request, profile: Optional[str] = None):
+    return await get_podcast(task_id, request, profile)
 
 async def process_podcast_creation(
     task_id: str,
     file_path: str,
     model: str,
-    original_filename: str
+    original_filename: str,
+    output_profiles: Optional[List[str]] = None
 ):
     try:
-        # 1. Extract text from PDF
-        TASKS[task_id].update({
-            "message": "Extracting text from PDF",
-            "progress": 0.2
-        })
-        with open(file_path, "rb") as f:
-            text_content = extract_text_from_pdf(f.read())
-        text_content = clean_text(text_content)
+        # 1. Extract text from PDF. Stage pools are shared, so a task may wait for a slot
+        # and only reports a stage once it is running it.
+        await update_task(task_id, {"message": "Waiting to extract text"})
+        async with EXTRACT_SLOTS:
+            await update_task(task_id, {
+                "message": "Extracting text from PDF",
+                "progress": 0.2
+            })
+            with open(file_path, "rb") as f:
+                pdf_bytes = f.read()
+            text_content = await asyncio.to_thread(extract_text_from_pdf, pdf_bytes)
+            text_content = clean_text(text_content)
         
         # 2. Generate podcast script using Groq
-        TASKS[task_id].update({
-            "message": "Generating podcast script",
-            "progress": 0.4
-        })
-        script = generate_podcast_script(client, text_content, model)
+        await update_task(task_id, {"message": "Waiting to generate script"})
+        async with LLM_SLOTS:
+            await update_task(task_id, {
+                "message": "Generating podcast script",
+                "progress": 0.4
+            })
+            # The Groq client is created inside the worker thread on first use
+            script = await asyncio.to_thread(
+                lambda: generate_podcast_script(get_groq_client(), text_content, model)
+            )
         
         # 3. Generate audio (Edge TTS)
-        TASKS[task_id].update({
-            "message": "Generating audio",
-            "progress": 0.8
-        })
+        await update_task(task_id, {"message": "Waiting to generate audio"})
         audio_path = None
         try:
-            audio_path = await create_audio(script, task_id)
+            async with TTS_SLOTS:
+                await update_task(task_id, {
+                    "message": "Generating audio",
+                    "progress": 0.8
+                })
+                audio_path = await create_audio(script, task_id)
         except Exception as e:
             logger.error(f"create_audio failed: {e}", exc_info=True)
             # Fallback: create 2-second silent audio
-            from pydub import AudioSegment
-            silent = AudioSegment.silent(duration=2000)
-            os.makedirs("podcasts", exist_ok=True)
-            audio_path = f"podcasts/podcast_{task_id}.mp3"
-            silent.export(audio_path, format="mp3")
+            audio_path = await asyncio.to_thread(write_silent_audio, f"podcasts/podcast_{task_id}.mp3", 2000)
             logger.info(f"Silent fallback audio saved to {audio_path}")
-        finally:
-            # 4. Save metadata and update status regardless of error
-            save_podcast_metadata(
-                task_id=task_id,
-                metadata={
-                    "original_filename": original_filename,
-                    "output_path": audio_path,
-                    "status": "completed"
-                }
-            )
-            TASKS[task_id].update({
-                "status": "completed",
-                "message": "Podcast created successfully",
-                "progress": 1.0,
-                "audio_path": audio_path,
-                "audio_url": f"/get_podcast/{task_id}"
+        
+        # 4. Final encode: normalize loudness once and write every rendition from one decode
+        renditions = {}
+        if output_profiles:
+            await update_task(task_id, {
+                "message": "Encoding audio",
+                "progress": 0.9
             })
+            cancel_encode = threading.Event()
+            encode = asyncio.create_task(
+                asyncio.to_thread(encode_renditions, audio_path, task_id, output_profiles, cancel_encode)
+            )
+            try:
+                renditions = await asyncio.shield(encode)
+            except asyncio.CancelledError:
+                # Cancelling the await leaves FFmpeg running: stop it and wait for its cleanup
+                cancel_encode.set()
+                try:
+                    await encode
+                except Exception:
+                    pass
+                raise
+            finally:
+                # On failure the task fails: the source MP3 must not pass for the requested formats
+                os.remove(audio_path)
+            audio_path = renditions[output_profiles[0]]
         
+        # 5. Save metadata and update status regardless of audio errors
+        digests = await asyncio.to_thread(
+            lambda: {
+                path: {"size": os.path.getsize(path), "sha256": compute_file_sha256(path)}
+                for path in [audio_path, *renditions.values()]
+            }
+        )
+        save_podcast_metadata(
+            task_id=task_id,
+            metadata={
+                "original_filename": original_filename,
+                "output_path": audio_path,
+                **digests[audio_path],
+                "renditions": {
+                    name: {"path": path, **digests[path]}
+                    for name, path in renditions.items()
+                },
+                "status": "completed"
+            }
+        )
+        await asyncio.to_thread(
+            register_podcast,
+            task_id,
+            [os.path.join("metadata", f"{task_id}.json"), audio_path] +
+            [path for path in renditions.values() if path != audio_path]
+        )
+        await update_task(task_id, {
+            "status": "completed",
+            "message": "Podcast created successfully",
+            "progress": 1.0,
+            "audio_path": audio_path,
+            "audio_url": f"/get_podcast/{task_id}",
+            "renditions": {name: f"/get_podcast/{task_id}?profile={name}" for name in renditions}
+        })
+        
+    except asyncio.CancelledError:
+        logger.info(f"Podcast task {task_id} cancelled")
+        await update_task(task_id, {
+            "status": "cancelled",
+            "message": "Cancelled",
+            "progress": 0
+        })
+        raise
     except Exception as e:
         logger.error(f"Error processing podcast: {str(e)}")
-        TASKS[task_id].update({
+        await update_task(task_id, {
             "status": "failed",
             "message": f"Error: {str(e)}",
             "progress": 0
@@ -211,6 +732,7 @@ async def process_podcast_creation(
         # Clean up uploaded file
         if os.path.exists(file_path):
             os.remove(file_path)
+        await asyncio.to_thread(discard_upload, task_id)
 
 if __name__ == "__main__":
     import uvicorn, os
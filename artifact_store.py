@@ -0,0 +1,156 @@
+import os
+import shutil
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Optional
+
+
+class ArtifactStore(ABC):
+    """Storage for uploads, speech chunks and finished episodes.
+
+    Keys are relative paths such as "uploads/<task>_<name>.pdf" or
+    "podcasts/podcast_<task>.mp3", matching the local directory layout.
+    """
+
+    @abstractmethod
+    def put_file(self, key: str, local_path: str) -> None:
+        ...
+
+    @abstractmethod
+    def put_bytes(self, key: str, data: bytes) -> None:
+        ...
+
+    @abstractmethod
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def fetch(self, key: str, local_path: str) -> bool:
+        """Copy an artifact to a local file; False if it does not exist."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Path of the artifact on this node's filesystem, if it has one."""
+        return None
+
+    def url(self, key: str, expires: int = 3600) -> Optional[str]:
+        """Time-limited download URL for stores that are not on the local filesystem."""
+        return None
+
+
+class FileSystemArtifactStore(ArtifactStore):
+    """Artifacts under a directory, e.g. a volume shared by API and worker nodes."""
+
+    def __init__(self, root: str = "."):
+        self.root = root
+
+    def local_path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def put_file(self, key: str, local_path: str) -> None:
+        path = self.local_path(key)
+        if os.path.exists(path) and os.path.samefile(path, local_path):
+            return
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        shutil.copyfile(local_path, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+    def put_bytes(self, key: str, data: bytes) -> None:
+        path = self.local_path(key)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self.local_path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def fetch(self, key: str, local_path: str) -> bool:
+        path = self.local_path(key)
+        if not os.path.exists(path):
+            return False
+        if os.path.exists(local_path) and os.path.samefile(path, local_path):
+            return True
+        os.makedirs(os.path.dirname(local_path) or ".", exist_ok=True)
+        shutil.copyfile(path, local_path)
+        return True
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self.local_path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3ArtifactStore(ArtifactStore):
+    """Artifacts in an S3-compatible bucket (AWS S3, MinIO, R2, ...)."""
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = None):
+        import boto3  # optional dependency, only needed for S3 storage
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key.replace(os.sep, "/")
+
+    def _is_missing(self, error) -> bool:
+        return error.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+    def put_file(self, key: str, local_path: str) -> None:
+        self.client.upload_file(local_path, self.bucket, self._key(key))
+
+    def put_bytes(self, key: str, data: bytes) -> None:
+        self.client.put_object(Bucket=self.bucket, Key=self._key(key), Body=data)
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        from botocore.exceptions import ClientError
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError as e:
+            if self._is_missing(e):
+                return None
+            raise
+        return response["Body"].read()
+
+    def fetch(self, key: str, local_path: str) -> bool:
+        from botocore.exceptions import ClientError
+        os.makedirs(os.path.dirname(local_path) or ".", exist_ok=True)
+        try:
+            self.client.download_file(self.bucket, self._key(key), local_path)
+        except ClientError as e:
+            if self._is_missing(e):
+                return False
+            raise
+        return True
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def url(self, key: str, expires: int = 3600) -> str:
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self._key(key)},
+            ExpiresIn=expires
+        )
+
+
+@lru_cache(maxsize=None)
+def get_artifact_store() -> ArtifactStore:
+    """Artifact store selected by ARTIFACT_STORE ("fs" or "s3")."""
+    backend = os.getenv("ARTIFACT_STORE", "fs").lower()
+    if backend == "fs":
+        return FileSystemArtifactStore(os.getenv("ARTIFACT_ROOT", "."))
+    if backend == "s3":
+        bucket = os.getenv("S3_BUCKET")
+        if not bucket:
+            raise ValueError("S3_BUCKET must be set when ARTIFACT_STORE=s3")
+        return S3ArtifactStore(bucket, os.getenv("S3_PREFIX", ""), os.getenv("S3_ENDPOINT_URL"))
+    raise ValueError(f"Unknown ARTIFACT_STORE '{backend}'. Use 'fs' or 's3'.")
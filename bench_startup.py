@@ -0,0 +1,76 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Modules that should only load when a podcast is actually generated
+HEAVY_MODULES = ["pydub", "edge_tts", "gtts", "groq", "PyPDF2"]
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+loaded = [name for name in {heavy!r} if name in sys.modules]
+print(f"{{elapsed:.6f}} {{','.join(loaded)}}")
+"""
+
+def measure_import(runs: int):
+    """Import app.py in fresh interpreters and collect import times."""
+    env = dict(os.environ)
+    # app.py refuses to import without these; the values are never used at import time
+    env.setdefault("GROQ_API_KEY", "bench")
+    env.setdefault("GROQ_MODEL", "bench")
+    timings = []
+    loaded = ""
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", PROBE.format(heavy=HEAVY_MODULES)],
+            capture_output=True, text=True, env=env
+        )
+        if result.returncode != 0:
+            raise Exception(f"Importing app failed:\n{result.stderr}")
+        elapsed, _, loaded = result.stdout.strip().splitlines()[-1].partition(" ")
+        timings.append(float(elapsed))
+    return timings, [name for name in loaded.split(",") if name]
+
+def top_imports(limit: int):
+    """Return the slowest modules from python -X importtime."""
+    env = dict(os.environ)
+    env.setdefault("GROQ_API_KEY", "bench")
+    env.setdefault("GROQ_MODEL", "bench")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        capture_output=True, text=True, env=env
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time:  self [us] | cumulative | imported package"
+        _, cumulative_us, name = line.split("|", 2)
+        rows.append((int(cumulative_us), name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API startup (import app) cost")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreter runs")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list (0 to skip)")
+    args = parser.parse_args()
+
+    timings, loaded = measure_import(args.runs)
+    print(f"import app: median {statistics.median(timings) * 1000:.1f} ms, "
+          f"min {min(timings) * 1000:.1f} ms, max {max(timings) * 1000:.1f} ms over {args.runs} runs")
+    if loaded:
+        print(f"WARNING: heavy modules loaded eagerly: {', '.join(loaded)}")
+    else:
+        print(f"Heavy modules deferred: {', '.join(HEAVY_MODULES)}")
+
+    if args.top:
+        print("\nSlowest imports (cumulative):")
+        for cumulative_us, name in top_imports(args.top):
+            print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "jobs.db")
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", 120))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+
+# state: 'queued' -> 'running' -> 'done', or 'cancelled' before a worker picks it up.
+# status holds the JSON task status served by /podcast_status. released is set once
+# the job's stored upload has been deleted.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    task_id TEXT PRIMARY KEY,
+    batch_id TEXT,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL,
+    status TEXT NOT NULL,
+    worker_id TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    released INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (state, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_batch ON jobs (batch_id);
+CREATE INDEX IF NOT EXISTS idx_jobs_release ON jobs (released, state);
+"""
+
+CANCELLED_STATUS = {"status": "cancelled", "message": "Cancelled", "progress": 0}
+
+
+class SQLiteJobQueue:
+    """Podcast job queue shared by API and worker processes through one SQLite file.
+
+    Workers hold a lease on the job they run and renew it with heartbeats; jobs
+    whose lease runs out (a crashed worker) are handed to another worker.
+    """
+
+    def __init__(self, path: str = JOB_QUEUE_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, task_id: str, payload: Dict, status: Dict, batch_id: Optional[str] = None) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (task_id, batch_id, payload, state, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+                (task_id, batch_id, json.dumps(payload), json.dumps(status), now, now)
+            )
+
+    def claim(self, worker_id: str, lease_seconds: float = JOB_LEASE_SECONDS) -> Optional[Dict]:
+        """Take the oldest queued job, or None if there is nothing to do."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Jobs of workers that stopped heartbeating are cancelled, retried or given up on
+                conn.execute(
+                    "UPDATE jobs SET state = 'cancelled', status = ?, updated_at = ? "
+                    "WHERE state = 'running' AND lease_expires < ? AND cancel_requested = 1",
+                    (json.dumps(CANCELLED_STATUS), now, now)
+                )
+                conn.execute(
+                    "UPDATE jobs SET state = 'queued', worker_id = NULL, updated_at = ? "
+                    "WHERE state = 'running' AND lease_expires < ? AND attempts < ?",
+                    (now, now, JOB_MAX_ATTEMPTS)
+                )
+                conn.execute(
+                    "UPDATE jobs SET state = 'done', status = ?, updated_at = ? "
+                    "WHERE state = 'running' AND lease_expires < ?",
+                    (json.dumps({"status": "failed", "message": "Error: worker lost", "progress": 0}), now, now)
+                )
+                row = conn.execute(
+                    "SELECT task_id, batch_id, payload, status FROM jobs "
+                    "WHERE state = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row:
+                    conn.execute(
+                        "UPDATE jobs SET state = 'running', worker_id = ?, lease_expires = ?, "
+                        "attempts = attempts + 1, updated_at = ? WHERE task_id = ?",
+                        (worker_id, now + lease_seconds, now, row[0])
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        if not row:
+            return None
+        return {
+            "task_id": row[0],
+            "batch_id": row[1],
+            "payload": json.loads(row[2]),
+            "status": json.loads(row[3])
+        }
+
+    def heartbeat(self, task_id: str, worker_id: str, lease_seconds: float = JOB_LEASE_SECONDS) -> bool:
+        """Extend a running job's lease; False means the worker no longer owns it."""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? "
+                "WHERE task_id = ? AND worker_id = ? AND state = 'running'",
+                (now + lease_seconds, now, task_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def update_status(self, task_id: str, status: Dict, worker_id: str) -> bool:
+        """Publish a running job's status; False if the worker no longer owns it."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? "
+                "WHERE task_id = ? AND worker_id = ? AND state = 'running'",
+                (json.dumps(status), time.time(), task_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def finish(self, task_id: str, status: Dict, worker_id: str) -> bool:
+        """Complete a running job; False if the worker lost it to another worker.
+
+        The finishing worker deletes the stored upload itself, so the job is marked released.
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET state = 'done', status = ?, lease_expires = NULL, released = 1, updated_at = ? "
+                "WHERE task_id = ? AND worker_id = ? AND state = 'running'",
+                (json.dumps(status), time.time(), task_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def take_unreleased(self, limit: int = 100) -> List[Dict]:
+        """Payloads of jobs that ended without a worker cleaning up (cancelled while
+        queued, or out of attempts), marked released so each is handed out once."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    "SELECT task_id, payload FROM jobs "
+                    "WHERE released = 0 AND state IN ('done', 'cancelled') LIMIT ?",
+                    (limit,)
+                ).fetchall()
+                conn.executemany("UPDATE jobs SET released = 1 WHERE task_id = ?", [(row[0],) for row in rows])
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return [json.loads(row[1]) for row in rows]
+
+    def request_cancel(self, task_ids: List[str]) -> int:
+        """Cancel queued jobs now and flag running ones for their worker; returns the count."""
+        now = time.time()
+        cancelled = 0
+        with self._connect() as conn:
+            for task_id in task_ids:
+                cursor = conn.execute(
+                    "UPDATE jobs SET state = 'cancelled', status = ?, cancel_requested = 1, updated_at = ? "
+                    "WHERE task_id = ? AND state = 'queued'",
+                    (json.dumps(CANCELLED_STATUS), now, task_id)
+                )
+                if not cursor.rowcount:
+                    cursor = conn.execute(
+                        "UPDATE jobs SET cancel_requested = 1, updated_at = ? "
+                        "WHERE task_id = ? AND state = 'running'",
+                        (now, task_id)
+                    )
+                cancelled += cursor.rowcount
+        return cancelled
+
+    def is_cancel_requested(self, task_id: str) -> bool:
+        with self._connect() as conn:
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE task_id = ?", (task_id,)).fetchone()
+        return bool(row and row[0])
+
+    def get_status(self, task_id: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT status FROM jobs WHERE task_id = ?", (task_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_batch(self, batch_id: str) -> Optional[Dict]:
+        """Task statuses of a batch in submission order, its cancel flag and creation time."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT task_id, status, cancel_requested, created_at FROM jobs "
+                "WHERE batch_id = ? ORDER BY created_at, rowid",
+                (batch_id,)
+            ).fetchall()
+        if not rows:
+            return None
+        return {
+            "tasks": {row[0]: json.loads(row[1]) for row in rows},
+            "cancelled": any(row[2] for row in rows),
+            "created_at": rows[0][3]
+        }
+
+
+@lru_cache(maxsize=None)
+def get_job_queue() -> SQLiteJobQueue:
+    """Shared job queue at JOB_QUEUE_PATH."""
+    return SQLiteJobQueue(JOB_QUEUE_PATH)
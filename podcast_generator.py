@@ -1,29 +1,164 @@
-from typing import Dict
-from pydub import AudioSegment
+from collections import OrderedDict
+import hashlib
+from typing import Dict, List, Optional, Tuple
 import os
 import unicodedata
 import re
+import subprocess
+import threading
 import time
 import traceback
 import asyncio
-import edge_tts
 import shutil
-import gtts
-
-# Configure FFmpeg path for pydub
-ffmpeg_default = shutil.which("ffmpeg")
-ffmpeg_local = os.path.join(os.getcwd(), "ffmpeg_temp", "ffmpeg-master-latest-win64-gpl", "bin", "ffmpeg.exe")
-if os.path.exists(ffmpeg_local):
-    AudioSegment.converter = ffmpeg_local
-elif ffmpeg_default:
-    AudioSegment.converter = ffmpeg_default
-else:
-    print("WARNING: FFmpeg not found. Install it or place binaries in ffmpeg_temp.")
-
-# Add ffmpeg_local directory to PATH for edge-tts
-ffmpeg_local_dir = os.path.dirname(ffmpeg_local)
-if os.path.isdir(ffmpeg_local_dir):
-    os.environ["PATH"] = ffmpeg_local_dir + os.pathsep + os.environ.get("PATH", "")
+
+from retention import record_access, register_cache_file
+
+# pydub, edge_tts and gtts are imported on first use to keep API startup fast
+
+# Result of the one-time FFmpeg probe; the lock stops concurrent first calls
+# (e.g. two prewarm hooks) from probing twice and prefixing PATH twice
+_ffmpeg_probe: Optional[Dict] = None
+_ffmpeg_probe_lock = threading.Lock()
+
+def _list_audio_encoders(ffmpeg_path: str) -> frozenset:
+    try:
+        result = subprocess.run([ffmpeg_path, "-hide_banner", "-encoders"], capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"WARNING: Could not list FFmpeg encoders: {e}")
+        return frozenset()
+    encoders = set()
+    # The legend ends at a "------" line; each entry is "<flags> <name> <description>"
+    lines = result.stdout.splitlines()
+    for line in lines[next((i + 1 for i, line in enumerate(lines) if line.strip().startswith("---")), 0):]:
+        parts = line.split()
+        if len(parts) >= 2 and parts[0].startswith("A"):
+            encoders.add(parts[1])
+    return frozenset(encoders)
+
+def probe_ffmpeg_capabilities() -> Dict:
+    """Locate FFmpeg and list its audio encoders once, configuring pydub and edge-tts to use it."""
+    global _ffmpeg_probe
+    with _ffmpeg_probe_lock:
+        if _ffmpeg_probe is not None:
+            return _ffmpeg_probe
+        ffmpeg_local = os.path.join(os.getcwd(), "ffmpeg_temp", "ffmpeg-master-latest-win64-gpl", "bin", "ffmpeg.exe")
+        # Add ffmpeg_local directory to PATH for edge-tts
+        ffmpeg_local_dir = os.path.dirname(ffmpeg_local)
+        if os.path.isdir(ffmpeg_local_dir):
+            os.environ["PATH"] = ffmpeg_local_dir + os.pathsep + os.environ.get("PATH", "")
+        ffmpeg_path = ffmpeg_local if os.path.exists(ffmpeg_local) else shutil.which("ffmpeg")
+        if not ffmpeg_path:
+            print("WARNING: FFmpeg not found. Install it or place binaries in ffmpeg_temp.")
+        from pydub import AudioSegment
+        if ffmpeg_path:
+            AudioSegment.converter = ffmpeg_path
+        _ffmpeg_probe = {
+            "path": ffmpeg_path,
+            "encoders": _list_audio_encoders(ffmpeg_path) if ffmpeg_path else frozenset()
+        }
+        return _ffmpeg_probe
+
+def probe_ffmpeg() -> Optional[str]:
+    """Path of the FFmpeg binary, probed once."""
+    return probe_ffmpeg_capabilities()["path"]
+
+def load_audio_segment():
+    """Import pydub's AudioSegment with FFmpeg configured."""
+    probe_ffmpeg()
+    from pydub import AudioSegment
+    return AudioSegment
+
+def write_silent_audio(output_path: str, duration_ms: int) -> str:
+    """Write a silent MP3. Blocking (pydub import and FFmpeg); call it from a worker thread."""
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    load_audio_segment().silent(duration=duration_ms).export(output_path, format="mp3")
+    return output_path
+
+# Output profiles for the final encode stage. Speech is mono, so bitrates are per channel.
+OUTPUT_PROFILES = {
+    "opus-32": {"codec": "libopus", "bitrate": "32k", "sample_rate": 48000, "format": "ogg", "ext": "opus", "extra": ["-application", "voip"]},
+    "mp3-64": {"codec": "libmp3lame", "bitrate": "64k", "sample_rate": 24000, "format": "mp3", "ext": "mp3"},
+    "mp3-128": {"codec": "libmp3lame", "bitrate": "128k", "sample_rate": 44100, "format": "mp3", "ext": "mp3"},
+    "aac-64": {"codec": "aac", "bitrate": "64k", "sample_rate": 44100, "format": "ipod", "ext": "m4a", "extra": ["-movflags", "+faststart"]},
+}
+
+# EBU R128 loudness normalization, tuned for spoken-word podcasts
+LOUDNORM_FILTER = "loudnorm=I=-16:TP=-1.5:LRA=11"
+
+def parse_output_profiles(value: Optional[str]) -> List[str]:
+    """Parse a comma-separated list of output profile names."""
+    if not value:
+        return []
+    profiles = []
+    for name in value.split(','):
+        name = name.strip().lower()
+        if not name:
+            continue
+        if name not in OUTPUT_PROFILES:
+            raise ValueError(f"Unknown output profile '{name}'. Choose from: {', '.join(OUTPUT_PROFILES)}")
+        if name not in profiles:
+            profiles.append(name)
+    return profiles
+
+def check_output_profiles(profiles: List[str]) -> None:
+    """Raise ValueError if this node's FFmpeg build cannot encode every profile."""
+    if not profiles:
+        return
+    capabilities = probe_ffmpeg_capabilities()
+    if not capabilities["path"]:
+        raise ValueError("FFmpeg is not available, so output profiles cannot be encoded")
+    unsupported = [name for name in profiles if OUTPUT_PROFILES[name]["codec"] not in capabilities["encoders"]]
+    if unsupported:
+        raise ValueError(f"Output profile not supported by this FFmpeg build: {', '.join(unsupported)}")
+
+def _remove_files(paths) -> None:
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+def encode_renditions(
+    source_path: str, task_id: str, profiles: List[str], cancel: Optional[threading.Event] = None
+) -> Dict[str, str]:
+    """Decode the source once, normalize loudness once and encode every requested profile.
+
+    Setting cancel kills FFmpeg and removes partial outputs before this returns.
+    """
+    if not profiles:
+        return {}
+    outputs = {
+        name: f"podcasts/podcast_{task_id}_{name}.{OUTPUT_PROFILES[name]['ext']}"
+        for name in profiles
+    }
+    labels = ''.join(f"[out{i}]" for i in range(len(profiles)))
+    # One decoded PCM stream, normalized once, then split into one branch per encoder
+    filter_graph = f"[0:a]{LOUDNORM_FILTER},asplit={len(profiles)}{labels}"
+    cmd = [probe_ffmpeg() or "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+           "-i", source_path, "-filter_complex", filter_graph]
+    for i, name in enumerate(profiles):
+        profile = OUTPUT_PROFILES[name]
+        cmd += ["-map", f"[out{i}]", "-ac", "1", "-ar", str(profile["sample_rate"]),
+                "-c:a", profile["codec"], "-b:a", profile["bitrate"],
+                *profile.get("extra", []), "-f", profile["format"], outputs[name]]
+    print(f"Encoding renditions {profiles} from {source_path}")
+    process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    try:
+        while True:
+            try:
+                stderr = process.communicate(timeout=0.5)[1]
+                break
+            except subprocess.TimeoutExpired:
+                if cancel is not None and cancel.is_set():
+                    raise Exception("Encoding cancelled")
+    except BaseException:
+        # FFmpeg must exit before its outputs (and, on Windows, its input) can be removed
+        process.kill()
+        process.communicate()
+        _remove_files(outputs.values())
+        raise
+    if process.returncode != 0:
+        _remove_files(outputs.values())
+        raise Exception(f"Error encoding renditions: {stderr.strip()}")
+    return outputs
 
 def sanitize_tts_text(text: str) -> str:
     # Replace smart quotes and dashes
@@ -162,13 +297,92 @@ OUTPUT THE SCRIPT DIRECTLY, NO COMMENTARY OR HEADERS:"""
         raise
 
 async def synthesize_edge_tts(text, voice, outfile):
+    import edge_tts
     communicate = edge_tts.Communicate(text, voice)
     await communicate.save(outfile)
 
+# Synthesized chunks shared across every task in the process, keyed by (voice, text).
+# Only chunks with the same voice and text are shared; scripts differ per document, so
+# that is mostly the pause between lines. Concurrent requests for a chunk await one job.
+TTS_CACHE_SIZE = int(os.getenv("TTS_CACHE_SIZE", 512))
+_TTS_CACHE: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+_TTS_INFLIGHT: Dict[Tuple[str, str], asyncio.Task] = {}
+
+async def _synthesize_edge_tts_bytes(text, voice) -> bytes:
+    import edge_tts
+    communicate = edge_tts.Communicate(text, voice)
+    audio = bytearray()
+    async for message in communicate.stream():
+        if message["type"] == "audio":
+            audio.extend(message["data"])
+    # Keep the pacing between edge-tts requests
+    await asyncio.sleep(0.5)
+    return bytes(audio)
+
+# Optional ArtifactStore shared by worker nodes, so a chunk synthesized on one node
+# is reused by every other node. Set by worker.py; None keeps the cache in-process only.
+CHUNK_STORE = None
+
+async def _load_or_synthesize_chunk(text, voice) -> bytes:
+    store_key = None
+    if CHUNK_STORE is not None:
+        store_key = "tts-cache/" + hashlib.sha256(f"{voice}\n{text}".encode("utf-8")).hexdigest() + ".mp3"
+        # Chunks on a filesystem store are expired by storage retention like podcasts
+        stored_path = CHUNK_STORE.local_path(store_key)
+        try:
+            audio = await asyncio.to_thread(CHUNK_STORE.get_bytes, store_key)
+            if audio:
+                if stored_path:
+                    record_access(stored_path)
+                return audio
+        except Exception as e:
+            print(f"Error reading shared TTS chunk {store_key}: {e}")
+    audio = await _synthesize_edge_tts_bytes(text, voice)
+    if store_key and audio:
+        try:
+            await asyncio.to_thread(CHUNK_STORE.put_bytes, store_key, audio)
+            if stored_path:
+                await asyncio.to_thread(register_cache_file, stored_path)
+        except Exception as e:
+            print(f"Error saving shared TTS chunk {store_key}: {e}")
+    return audio
+
+def _store_synthesized_chunk(key, job: asyncio.Task):
+    _TTS_INFLIGHT.pop(key, None)
+    if job.cancelled() or job.exception() is not None or not job.result():
+        return
+    _TTS_CACHE[key] = job.result()
+    _TTS_CACHE.move_to_end(key)
+    while len(_TTS_CACHE) > TTS_CACHE_SIZE:
+        _TTS_CACHE.popitem(last=False)
+
+async def synthesize_chunk_cached(text: str, voice: str) -> bytes:
+    """Synthesize a chunk with edge-tts, reusing audio for identical (voice, text) chunks."""
+    key = (voice, text)
+    cached = _TTS_CACHE.get(key)
+    if cached is not None:
+        _TTS_CACHE.move_to_end(key)
+        return cached
+    job = _TTS_INFLIGHT.get(key)
+    if job is None:
+        job = asyncio.ensure_future(_load_or_synthesize_chunk(text, voice))
+        job.add_done_callback(lambda j: _store_synthesized_chunk(key, j))
+        _TTS_INFLIGHT[key] = job
+    # Shield the shared job so cancelling one task does not cancel it for the others
+    return await asyncio.shield(job)
+
+async def prewarm_tts() -> None:
+    """Load the TTS stack and warm edge-tts with the pause chunk used between segments."""
+    await asyncio.to_thread(probe_ffmpeg)
+    await asyncio.to_thread(__import__, "edge_tts")
+    for voice in ("en-US-GuyNeural", "en-GB-LibbyNeural"):
+        await synthesize_chunk_cached("...", voice)
+
 async def create_audio(script: str, task_id: str) -> str:
     """Create audio file from the podcast script using edge-tts."""
     try:
         print(f"Creating audio for script length: {len(script)}")
+        await asyncio.to_thread(probe_ffmpeg)
         print("Script preview:", script[:200])
         
         # Split script into segments
@@ -234,8 +448,8 @@ async def create_audio(script: str, task_id: str) -> str:
         # Create output directory if it doesn't exist
         os.makedirs("podcasts", exist_ok=True)
         
-        # Create temporary directory for segment files
-        temp_dir = os.path.join("podcasts", "temp")
+        # Create temporary directory for segment files (per task, batches run concurrently)
+        temp_dir = os.path.join("podcasts", "temp", task_id)
         os.makedirs(temp_dir, exist_ok=True)
         
         # Generate audio segments with different voices using edge-tts
@@ -264,9 +478,10 @@ async def create_audio(script: str, task_id: str) -> str:
                 # Try primary and fallback voices; skip chunk if both fail
                 for v in voices:
                     try:
-                        await synthesize_edge_tts(chunk, v, temp_path)
-                        await asyncio.sleep(0.5)
-                        if os.path.exists(temp_path) and os.path.getsize(temp_path) > 0:
+                        chunk_audio = await synthesize_chunk_cached(chunk, v)
+                        if chunk_audio:
+                            with open(temp_path, 'wb') as f:
+                                f.write(chunk_audio)
                             success = True
                             break
                         print(f"Empty audio with voice {v}")
@@ -278,6 +493,7 @@ async def create_audio(script: str, task_id: str) -> str:
                 if not success:
                     print(f"Edge TTS failed for segment {i+1} chunk {chunk_idx+1}, trying gTTS fallback")
                     try:
+                        import gtts
                         tts = gtts.gTTS(text=chunk, lang='en')
                         tts.save(temp_path)
                         if os.path.exists(temp_path) and os.path.getsize(temp_path) > 0:
@@ -292,20 +508,14 @@ async def create_audio(script: str, task_id: str) -> str:
                     continue
                 # Add pause between segments
                 if seg_number > 1:
-                    pause_path = os.path.join(temp_dir, f"pause_{i}_{chunk_idx}.mp3")
                     try:
-                        await synthesize_edge_tts("...", primary_voice, pause_path)
-                        await asyncio.sleep(0.2)
-                        if os.path.exists(pause_path) and os.path.getsize(pause_path) > 0:
-                            with open(pause_path, 'rb') as f:
-                                audio_segments.append(f.read())
+                        pause_audio = await synthesize_chunk_cached("...", primary_voice)
+                        if pause_audio:
+                            audio_segments.append(pause_audio)
                         else:
-                            print(f"Skipping pause audio: file empty or missing")
+                            print(f"Skipping pause audio: empty audio")
                     except Exception as e_pause:
                         print(f"Error generating pause audio: {e_pause}")
-                    finally:
-                        if os.path.exists(pause_path):
-                            os.remove(pause_path)
                 # Add segment audio
                 with open(temp_path, 'rb') as f:
                     audio_segments.append(f.read())
@@ -314,10 +524,8 @@ async def create_audio(script: str, task_id: str) -> str:
         if not audio_segments:
             print("No audio segments were generated; creating silent fallback audio")
             # Create a 1-second silent audio segment as fallback
-            from pydub import AudioSegment as _AudioSegment
-            silent = _AudioSegment.silent(duration=1000)
             output_path = f"podcasts/podcast_{task_id}.mp3"
-            silent.export(output_path, format="mp3")
+            await asyncio.to_thread(write_silent_audio, output_path, 1000)
             print(f"Silent audio saved to {output_path}")
             return output_path
         
@@ -342,10 +550,8 @@ async def create_audio(script: str, task_id: str) -> str:
         print(f"Error in create_audio: {e}")
         # Fallback to silent audio on any error
         print("Creating 1-second silent fallback audio due to error.")
-        from pydub import AudioSegment as _AudioSegment
-        silent = _AudioSegment.silent(duration=1000)
         output_path = f"podcasts/podcast_{task_id}.mp3"
-        silent.export(output_path, format="mp3")
+        await asyncio.to_thread(write_silent_audio, output_path, 1000)
         print(f"Silent fallback audio saved to {output_path}")
         return output_path
 
@@ -353,6 +559,7 @@ def add_background_music(audio_path: str, music_path: str, output_path: str):
     """Add background music to the podcast."""
     try:
         # Load the podcast audio and background music
+        AudioSegment = load_audio_segment()
         podcast = AudioSegment.from_mp3(audio_path)
         music = AudioSegment.from_mp3(music_path)
         
@@ -0,0 +1,252 @@
+import asyncio
+import glob
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from utils import invalidate_podcast_file_info
+
+# Retention settings
+STORAGE_INDEX_PATH = os.getenv("STORAGE_INDEX_PATH", "storage_index.db")
+STORAGE_QUOTA_BYTES = int(float(os.getenv("STORAGE_QUOTA_MB", 2048)) * 1024 * 1024)
+STORAGE_TTL_SECONDS = float(os.getenv("STORAGE_TTL_DAYS", 30)) * 86400
+UPLOAD_TTL_SECONDS = float(os.getenv("UPLOAD_TTL_HOURS", 24)) * 3600
+TOMBSTONE_TTL_SECONDS = float(os.getenv("TOMBSTONE_TTL_DAYS", 90)) * 86400
+COMPACTION_INTERVAL_SECONDS = float(os.getenv("COMPACTION_INTERVAL_SECONDS", 600))
+
+# Every task owns a row: 'pending' while its upload is on disk, 'ready' once the
+# podcast exists and 'evicted' (a tombstone) after its files were removed.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    task_id TEXT PRIMARY KEY,
+    paths TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    evicted_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_artifacts_lru ON artifacts (state, last_access);
+"""
+
+_TASK_FILE_PATTERN = re.compile(r"^podcast_([0-9a-f-]{36})")
+
+# Guards the index connection; held only for SQL, never for file deletes
+_lock = threading.Lock()
+_conn: Optional[sqlite3.Connection] = None
+# Downloads are recorded in memory and flushed by compaction, so serving stays off disk
+_pending_access: Dict[str, float] = {}
+_pending_access_lock = threading.Lock()
+_evicted = set()
+
+def _connection() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(STORAGE_INDEX_PATH, check_same_thread=False)
+        _conn.executescript(SCHEMA)
+    return _conn
+
+def _paths_size(paths: List[str]) -> int:
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+def _seed_from_disk(conn: sqlite3.Connection) -> int:
+    """Index podcasts created before the index existed (one scan, first start only)."""
+    tasks: Dict[str, List[str]] = {}
+    for metadata_path in glob.glob(os.path.join("metadata", "*.json")):
+        task_id = os.path.splitext(os.path.basename(metadata_path))[0]
+        paths = tasks.setdefault(task_id, [])
+        paths.append(metadata_path)
+        try:
+            with open(metadata_path, "r") as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for path in [metadata.get("output_path")] + [
+            rendition.get("path") for rendition in metadata.get("renditions", {}).values()
+        ]:
+            if path and path not in paths:
+                paths.append(path)
+    for audio_path in glob.glob(os.path.join("podcasts", "podcast_*")):
+        match = _TASK_FILE_PATTERN.match(os.path.basename(audio_path))
+        if not match:
+            continue
+        paths = tasks.setdefault(match.group(1), [])
+        if not any(os.path.normpath(path) == os.path.normpath(audio_path) for path in paths):
+            paths.append(audio_path)
+    for task_id, paths in tasks.items():
+        existing = [path for path in paths if os.path.exists(path)]
+        created = max([os.path.getmtime(path) for path in existing] or [time.time()])
+        conn.execute(
+            "INSERT OR IGNORE INTO artifacts (task_id, paths, size_bytes, state, created_at, last_access) "
+            "VALUES (?, ?, ?, 'ready', ?, ?)",
+            (task_id, json.dumps(paths), _paths_size(paths), created, created)
+        )
+    return len(tasks)
+
+def init_storage_index() -> None:
+    """Open the storage index, seeding it from disk the first time."""
+    with _lock:
+        conn = _connection()
+        if conn.execute("SELECT COUNT(*) FROM artifacts").fetchone()[0] == 0:
+            seeded = _seed_from_disk(conn)
+            print(f"Storage index seeded with {seeded} existing tasks")
+        conn.commit()
+        _evicted.update(
+            row[0] for row in conn.execute("SELECT task_id FROM artifacts WHERE state = 'evicted'")
+        )
+
+def register_upload(task_id: str, upload_path: str) -> None:
+    """Track an upload so it is reclaimed even if processing never finishes."""
+    now = time.time()
+    with _lock:
+        conn = _connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO artifacts (task_id, paths, size_bytes, state, created_at, last_access) "
+            "VALUES (?, ?, ?, 'pending', ?, ?)",
+            (task_id, json.dumps([upload_path]), _paths_size([upload_path]), now, now)
+        )
+        conn.commit()
+
+def discard_upload(task_id: str) -> None:
+    """Forget a task whose upload was removed without producing a podcast."""
+    with _lock:
+        conn = _connection()
+        conn.execute("DELETE FROM artifacts WHERE task_id = ? AND state = 'pending'", (task_id,))
+        conn.commit()
+
+def register_podcast(task_id: str, paths: List[str]) -> None:
+    """Record the files of a finished podcast."""
+    now = time.time()
+    with _lock:
+        conn = _connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO artifacts (task_id, paths, size_bytes, state, created_at, last_access) "
+            "VALUES (?, ?, ?, 'ready', ?, ?)",
+            (task_id, json.dumps(paths), _paths_size(paths), now, now)
+        )
+        conn.commit()
+
+def register_cache_file(path: str) -> None:
+    """Track a shared cache file, such as a synthesized speech chunk, under its own path."""
+    register_podcast(path, [path])
+    _evicted.discard(path)
+
+def forget_task(task_id: str) -> None:
+    """Drop a task from the index without touching its files."""
+    with _lock:
+        conn = _connection()
+        conn.execute("DELETE FROM artifacts WHERE task_id = ?", (task_id,))
+        conn.commit()
+
+def record_access(task_id: str) -> None:
+    """Mark a podcast as recently downloaded."""
+    with _pending_access_lock:
+        _pending_access[task_id] = time.time()
+
+def is_evicted(task_id: str, check_index: bool = False) -> bool:
+    """Check whether a task's podcast was removed by retention.
+
+    check_index also consults the index, for evictions made by another process
+    sharing it (e.g. a worker compacting a shared volume).
+    """
+    if task_id in _evicted:
+        return True
+    if not check_index:
+        return False
+    with _lock:
+        row = _connection().execute(
+            "SELECT 1 FROM artifacts WHERE task_id = ? AND state = 'evicted'", (task_id,)
+        ).fetchone()
+    if row:
+        _evicted.add(task_id)
+    return bool(row)
+
+def _remove_files(paths: List[str]) -> None:
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error removing {path}: {e}")
+
+def _evict(conn: sqlite3.Connection, task_id: str, now: float) -> None:
+    # Files are removed by the caller after the index lock is released
+    conn.execute(
+        "UPDATE artifacts SET state = 'evicted', size_bytes = 0, evicted_at = ? WHERE task_id = ?",
+        (now, task_id)
+    )
+    invalidate_podcast_file_info(task_id)
+    _evicted.add(task_id)
+
+def compact(now: Optional[float] = None) -> Dict[str, int]:
+    """Evict expired podcasts, then least recently downloaded ones until under quota."""
+    global _pending_access
+    now = now or time.time()
+    stats = {"expired": 0, "over_quota": 0, "stale_uploads": 0, "tombstones": 0}
+    doomed_paths: List[str] = []
+    with _pending_access_lock:
+        accesses, _pending_access = _pending_access, {}
+    with _lock:
+        conn = _connection()
+        conn.executemany(
+            "UPDATE artifacts SET last_access = MAX(last_access, ?) WHERE task_id = ? AND state = 'ready'",
+            [(accessed, task_id) for task_id, accessed in accesses.items()]
+        )
+
+        for task_id, paths in conn.execute(
+            "SELECT task_id, paths FROM artifacts WHERE state = 'ready' AND last_access < ?",
+            (now - STORAGE_TTL_SECONDS,)
+        ).fetchall():
+            _evict(conn, task_id, now)
+            doomed_paths += json.loads(paths)
+            stats["expired"] += 1
+
+        total = conn.execute(
+            "SELECT COALESCE(SUM(size_bytes), 0) FROM artifacts WHERE state != 'evicted'"
+        ).fetchone()[0]
+        if total > STORAGE_QUOTA_BYTES:
+            for task_id, paths, size in conn.execute(
+                "SELECT task_id, paths, size_bytes FROM artifacts WHERE state = 'ready' ORDER BY last_access"
+            ).fetchall():
+                if total <= STORAGE_QUOTA_BYTES:
+                    break
+                _evict(conn, task_id, now)
+                doomed_paths += json.loads(paths)
+                total -= size
+                stats["over_quota"] += 1
+
+        # Uploads left behind by crashed or abandoned tasks
+        for task_id, paths in conn.execute(
+            "SELECT task_id, paths FROM artifacts WHERE state = 'pending' AND created_at < ?",
+            (now - UPLOAD_TTL_SECONDS,)
+        ).fetchall():
+            doomed_paths += json.loads(paths)
+            conn.execute("DELETE FROM artifacts WHERE task_id = ?", (task_id,))
+            stats["stale_uploads"] += 1
+
+        expired_tombstones = [row[0] for row in conn.execute(
+            "SELECT task_id FROM artifacts WHERE state = 'evicted' AND evicted_at < ?",
+            (now - TOMBSTONE_TTL_SECONDS,)
+        )]
+        conn.executemany("DELETE FROM artifacts WHERE task_id = ?", [(t,) for t in expired_tombstones])
+        _evicted.difference_update(expired_tombstones)
+        stats["tombstones"] = len(expired_tombstones)
+        conn.commit()
+    _remove_files(doomed_paths)
+    return stats
+
+async def compaction_loop() -> None:
+    """Run compaction periodically in the background."""
+    while True:
+        try:
+            stats = await asyncio.to_thread(compact)
+            if any(stats.values()):
+                print(f"Storage compaction: {stats}")
+        except Exception as e:
+            print(f"Error in storage compaction: {str(e)}")
+        await asyncio.sleep(COMPACTION_INTERVAL_SECONDS)
@@ -0,0 +1,121 @@
+import os
+
+import pytest
+
+import job_queue
+from artifact_store import ArtifactStore, FileSystemArtifactStore
+from job_queue import SQLiteJobQueue
+
+STATUS = {"status": "processing", "message": "Queued", "progress": 0}
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return SQLiteJobQueue(str(tmp_path / "jobs.db"))
+
+
+def enqueue(queue, task_id, batch_id=None):
+    queue.enqueue(task_id, {"file_key": f"uploads/{task_id}.pdf"}, STATUS, batch_id)
+
+
+def test_claim_takes_oldest_job_once(queue):
+    enqueue(queue, "a")
+    enqueue(queue, "b")
+    assert queue.claim("w1")["task_id"] == "a"
+    assert queue.claim("w2")["task_id"] == "b"
+    assert queue.claim("w3") is None
+
+
+def test_expired_lease_is_retried_by_another_worker(queue):
+    enqueue(queue, "a")
+    queue.claim("w1", lease_seconds=-1)
+    job = queue.claim("w2")
+    assert job["task_id"] == "a"
+    # The first worker no longer owns the job and cannot touch its state
+    assert not queue.heartbeat("a", "w1")
+    assert not queue.update_status("a", {"status": "processing", "message": "stale", "progress": 50}, "w1")
+    assert not queue.finish("a", {"status": "failed", "message": "stale", "progress": 0}, "w1")
+    assert queue.heartbeat("a", "w2")
+    assert queue.finish("a", {"status": "completed", "message": "Done", "progress": 100}, "w2")
+    assert queue.get_status("a")["status"] == "completed"
+
+
+def test_job_is_given_up_after_max_attempts(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_MAX_ATTEMPTS", 2)
+    enqueue(queue, "a")
+    queue.claim("w1", lease_seconds=-1)
+    queue.claim("w2", lease_seconds=-1)
+    assert queue.claim("w3") is None
+    assert queue.get_status("a")["message"] == "Error: worker lost"
+    assert queue.take_unreleased() == [{"file_key": "uploads/a.pdf"}]
+    assert queue.take_unreleased() == []
+
+
+def test_request_cancel(queue):
+    enqueue(queue, "queued", "batch")
+    enqueue(queue, "running", "batch")
+    queue.claim("w1")  # the oldest job, "queued"
+    queue.claim("w2")
+    enqueue(queue, "waiting", "batch")
+    assert queue.request_cancel(["queued", "waiting"]) == 2
+    assert queue.get_status("waiting")["status"] == "cancelled"
+    # A running job keeps going until its worker sees the flag
+    assert queue.get_status("queued")["status"] == "processing"
+    assert queue.is_cancel_requested("queued")
+    assert not queue.is_cancel_requested("running")
+    assert queue.claim("w3") is None
+    assert queue.get_batch("batch")["cancelled"]
+    # Only the job that never reached a worker needs its upload released
+    assert queue.take_unreleased() == [{"file_key": "uploads/waiting.pdf"}]
+
+
+def test_cancelled_job_with_expired_lease_is_not_retried(queue):
+    enqueue(queue, "a")
+    queue.claim("w1", lease_seconds=-1)
+    queue.request_cancel(["a"])
+    assert queue.claim("w2") is None
+    assert queue.get_status("a")["status"] == "cancelled"
+
+
+def test_finish_releases_job(queue):
+    enqueue(queue, "a")
+    queue.claim("w1")
+    assert queue.finish("a", {"status": "completed", "message": "Done", "progress": 100}, "w1")
+    assert queue.take_unreleased() == []
+
+
+def test_artifact_store_is_abstract():
+    with pytest.raises(TypeError):
+        ArtifactStore()
+
+
+def test_filesystem_store_round_trip(tmp_path):
+    store = FileSystemArtifactStore(str(tmp_path / "store"))
+    source = tmp_path / "episode.mp3"
+    source.write_bytes(b"audio")
+
+    store.put_file("podcasts/episode.mp3", str(source))
+    assert store.get_bytes("podcasts/episode.mp3") == b"audio"
+    target = tmp_path / "work" / "episode.mp3"
+    assert store.fetch("podcasts/episode.mp3", str(target))
+    assert target.read_bytes() == b"audio"
+
+    store.put_bytes("tts-cache/chunk.mp3", b"chunk")
+    assert store.get_bytes("tts-cache/chunk.mp3") == b"chunk"
+
+    store.delete("podcasts/episode.mp3")
+    store.delete("podcasts/episode.mp3")
+    assert store.get_bytes("podcasts/episode.mp3") is None
+    assert not store.fetch("podcasts/episode.mp3", str(target))
+
+
+def test_filesystem_store_in_place(tmp_path):
+    # With the store rooted at the working directory, keys are the local files themselves
+    store = FileSystemArtifactStore(str(tmp_path))
+    path = tmp_path / "podcasts" / "episode.mp3"
+    path.parent.mkdir()
+    path.write_bytes(b"audio")
+    store.put_file("podcasts/episode.mp3", str(path))
+    assert store.fetch("podcasts/episode.mp3", str(path))
+    assert os.path.samefile(store.local_path("podcasts/episode.mp3"), path)
+    assert path.read_bytes() == b"audio"
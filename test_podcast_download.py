@@ -0,0 +1,113 @@
+import json
+import os
+from email.utils import formatdate
+from uuid import uuid4
+
+import pytest
+
+pytest.importorskip("httpx")  # needed by FastAPI's TestClient
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("GROQ_API_KEY", "test")
+os.environ.setdefault("GROQ_MODEL", "test-model")
+
+import app  # noqa: E402
+
+AUDIO = b"0123456789"
+
+
+@pytest.fixture
+def client():
+    # Not used as a context manager, so the lifespan (index, prewarm) does not run
+    return TestClient(app.app)
+
+
+@pytest.fixture
+def podcast(tmp_path, monkeypatch):
+    """A completed podcast in a scratch working directory; returns its task id."""
+    monkeypatch.chdir(tmp_path)
+    task_id = str(uuid4())
+    os.makedirs("podcasts")
+    os.makedirs("metadata")
+    audio_path = os.path.join("podcasts", f"podcast_{task_id}.mp3")
+    with open(audio_path, "wb") as f:
+        f.write(AUDIO)
+    with open(os.path.join("metadata", f"{task_id}.json"), "w") as f:
+        json.dump({"status": "completed", "output_path": audio_path, "renditions": {}}, f)
+    return task_id
+
+
+def get(client, task_id, headers=None, method="GET"):
+    return client.request(method, f"/get_podcast/{task_id}", headers=headers or {})
+
+
+def test_full_download_has_validators(client, podcast):
+    response = get(client, podcast)
+    assert response.status_code == 200
+    assert response.content == AUDIO
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["etag"].startswith('"')
+    assert "last-modified" in response.headers
+
+
+@pytest.mark.parametrize("range_header, start, end", [
+    ("bytes=2-5", 2, 5),
+    ("bytes=4-", 4, 9),
+    ("bytes=-3", 7, 9),
+    ("bytes=-50", 0, 9),
+    ("bytes=8-100", 8, 9),
+])
+def test_range_requests(client, podcast, range_header, start, end):
+    response = get(client, podcast, {"Range": range_header})
+    assert response.status_code == 206
+    assert response.content == AUDIO[start:end + 1]
+    assert response.headers["content-range"] == f"bytes {start}-{end}/{len(AUDIO)}"
+    assert response.headers["content-length"] == str(end - start + 1)
+
+
+@pytest.mark.parametrize("range_header", ["bytes=10-", "bytes=-0", "bytes=6-3"])
+def test_unsatisfiable_range(client, podcast, range_header):
+    response = get(client, podcast, {"Range": range_header})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(AUDIO)}"
+
+
+def test_if_range(client, podcast):
+    etag = get(client, podcast).headers["etag"]
+    assert get(client, podcast, {"Range": "bytes=0-1", "If-Range": etag}).status_code == 206
+    # A stale validator means the client's partial copy is outdated: send everything
+    response = get(client, podcast, {"Range": "bytes=0-1", "If-Range": '"stale"'})
+    assert response.status_code == 200
+    assert response.content == AUDIO
+
+
+def test_conditional_get(client, podcast):
+    first = get(client, podcast)
+    etag = first.headers["etag"]
+    assert get(client, podcast, {"If-None-Match": etag}).status_code == 304
+    assert get(client, podcast, {"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+    response = get(client, podcast, {"If-Modified-Since": first.headers["last-modified"]})
+    assert response.status_code == 304
+
+
+def test_if_none_match_takes_precedence(client, podcast):
+    future = formatdate(2 ** 31, usegmt=True)
+    response = get(client, podcast, {"If-None-Match": '"other"', "If-Modified-Since": future})
+    assert response.status_code == 200
+    assert response.content == AUDIO
+
+
+def test_head_range_and_not_modified_have_no_body(client, podcast):
+    etag = get(client, podcast).headers["etag"]
+    response = get(client, podcast, {"Range": "bytes=2-5"}, method="HEAD")
+    assert response.status_code == 206
+    assert response.content == b""
+    assert response.headers["content-length"] == "4"
+    assert response.headers["content-range"] == f"bytes 2-5/{len(AUDIO)}"
+    response = get(client, podcast, {"If-None-Match": etag}, method="HEAD")
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+def test_missing_podcast(client, podcast):
+    assert get(client, str(uuid4())).status_code == 404
@@ -1,12 +1,21 @@
+import hashlib
 import io
 import json
+import mimetypes
 import os
-import PyPDF2
+import threading
+import time
+from collections import OrderedDict
 from typing import Dict, Optional
 
+# Not every platform's mimetypes table knows the podcast rendition containers
+mimetypes.add_type("audio/ogg", ".opus")
+mimetypes.add_type("audio/mp4", ".m4a")
+
 def extract_text_from_pdf(pdf_bytes: bytes) -> str:
     """Extract text from a PDF file."""
     try:
+        import PyPDF2  # imported on first use to keep API startup fast
         print(f"Extracting text from PDF, size: {len(pdf_bytes)} bytes")
         pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
         print(f"PDF has {len(pdf_reader.pages)} pages")
@@ -56,3 +65,93 @@ def get_podcast_metadata(task_id: str) -> Optional[Dict]:
             return json.load(f)
     except Exception as e:
         raise Exception(f"Error reading metadata: {str(e)}")
+
+def compute_file_sha256(path: str) -> str:
+    """Compute the SHA-256 hex digest of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# In-process LRU of (task_id, profile) -> served file info, so repeat downloads skip metadata/
+PODCAST_FILE_CACHE_SIZE = int(os.getenv("PODCAST_FILE_CACHE_SIZE", 1024))
+_PODCAST_FILE_CACHE: "OrderedDict[str, Dict]" = OrderedDict()
+# Lookups run in worker threads, so cache updates are serialised
+_podcast_file_cache_lock = threading.Lock()
+
+def get_podcast_file_info(
+    task_id: str, profile: Optional[str] = None, metadata: Optional[Dict] = None
+) -> Optional[Dict]:
+    """Get path, size, mtime, media type and strong ETag of a completed podcast rendition.
+
+    metadata replaces metadata/<task_id>.json on a cache miss, e.g. for a podcast read
+    from a shared volume. Blocking (stat, and hashing on a cache miss); call it from a
+    worker thread.
+    """
+    key = (task_id, profile)
+    with _podcast_file_cache_lock:
+        info = _PODCAST_FILE_CACHE.get(key)
+    if info is not None and "url" in info:
+        # Redirect to an artifact store URL, valid until shortly before it expires
+        with _podcast_file_cache_lock:
+            if info["expires_at"] > time.time():
+                if key in _PODCAST_FILE_CACHE:
+                    _PODCAST_FILE_CACHE.move_to_end(key)
+                return info
+            _PODCAST_FILE_CACHE.pop(key, None)
+        info = None
+    if info is not None:
+        try:
+            stat = os.stat(info["path"])
+        except OSError:
+            stat = None
+        with _podcast_file_cache_lock:
+            if stat and stat.st_size == info["size"] and stat.st_mtime == info["mtime"]:
+                if key in _PODCAST_FILE_CACHE:
+                    _PODCAST_FILE_CACHE.move_to_end(key)
+                return info
+            _PODCAST_FILE_CACHE.pop(key, None)
+
+    metadata = metadata or get_podcast_metadata(task_id)
+    if not metadata or metadata.get("status") != "completed":
+        return None
+    if profile:
+        metadata = metadata.get("renditions", {}).get(profile)
+        if not metadata:
+            return None
+        path = metadata.get("path")
+    else:
+        path = metadata.get("output_path")
+    if not path or not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    # Hash recorded at creation time is reused as long as the file is unchanged
+    sha256 = metadata.get("sha256") if metadata.get("size") == stat.st_size else None
+    info = {
+        "path": path,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "etag": f'"{sha256 or compute_file_sha256(path)}"',
+        "media_type": mimetypes.guess_type(path)[0] or "audio/mpeg"
+    }
+    _cache_podcast_file_info(key, info)
+    return info
+
+def _cache_podcast_file_info(key, info: Dict) -> None:
+    with _podcast_file_cache_lock:
+        _PODCAST_FILE_CACHE[key] = info
+        while len(_PODCAST_FILE_CACHE) > PODCAST_FILE_CACHE_SIZE:
+            _PODCAST_FILE_CACHE.popitem(last=False)
+
+def cache_podcast_url(task_id: str, profile: Optional[str], url: str, expires_at: float) -> Dict:
+    """Remember a download URL for a podcast held in a remote artifact store."""
+    info = {"url": url, "expires_at": expires_at}
+    _cache_podcast_file_info((task_id, profile), info)
+    return info
+
+def invalidate_podcast_file_info(task_id: str) -> None:
+    """Drop every rendition of a task from the served file cache."""
+    with _podcast_file_cache_lock:
+        for key in [key for key in _PODCAST_FILE_CACHE if key[0] == task_id]:
+            _PODCAST_FILE_CACHE.pop(key, None)
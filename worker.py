@@ -0,0 +1,159 @@
+import argparse
+import asyncio
+import os
+import socket
+
+# Workers publish task status to the shared queue; must be set before importing app
+os.environ["WORKER_MODE"] = "queue"
+
+import podcast_generator
+from app import TASKS, TASK_OWNERS, process_podcast_creation, logger
+from artifact_store import get_artifact_store
+from job_queue import CANCELLED_STATUS, JOB_LEASE_SECONDS, get_job_queue
+from retention import compaction_loop, forget_task, init_storage_index, register_podcast
+from utils import get_podcast_metadata, invalidate_podcast_file_info
+
+POLL_SECONDS = float(os.getenv("WORKER_POLL_SECONDS", 2))
+# How often a running job renews its lease and checks for cancellation
+CHECK_SECONDS = min(JOB_LEASE_SECONDS / 3, 5)
+
+def publish_podcast(task_id: str) -> None:
+    """Copy a finished podcast and its metadata into the artifact store."""
+    store = get_artifact_store()
+    metadata = get_podcast_metadata(task_id) or {}
+    paths = [metadata.get("output_path")] + [
+        rendition["path"] for rendition in metadata.get("renditions", {}).values()
+    ]
+    paths = [path for path in dict.fromkeys(paths) if path]
+    for path in paths:
+        store.put_file(path, path)
+    # Metadata goes last so API nodes never see a podcast before its audio
+    metadata_path = os.path.join("metadata", f"{task_id}.json")
+    store.put_file(metadata_path, metadata_path)
+
+    stored_paths = []
+    for path in paths + [metadata_path]:
+        stored_path = store.local_path(path)
+        stored_paths.append(stored_path)
+        # This node's copy is redundant unless it is the stored file itself
+        if not stored_path or os.path.abspath(stored_path) != os.path.abspath(path):
+            if os.path.exists(path):
+                os.remove(path)
+    invalidate_podcast_file_info(task_id)
+    # Retention covers files on a filesystem store; remote stores expire artifacts
+    # through their own lifecycle rules
+    if all(stored_paths):
+        register_podcast(task_id, stored_paths)
+    else:
+        forget_task(task_id)
+
+async def run_job(job: dict, worker_id: str) -> None:
+    queue = get_job_queue()
+    store = get_artifact_store()
+    task_id = job["task_id"]
+    payload = job["payload"]
+    TASKS[task_id] = dict(job["status"])
+    TASK_OWNERS[task_id] = worker_id
+    try:
+        # Work on a private copy; the stored upload stays put until the job is finished
+        file_path = os.path.join("uploads", f"work_{worker_id}_{os.path.basename(payload['file_key'])}")
+        if not await asyncio.to_thread(store.fetch, payload["file_key"], file_path):
+            await asyncio.to_thread(
+                queue.finish, task_id, {"status": "failed", "message": "Error: upload not found", "progress": 0}, worker_id
+            )
+            return
+
+        run = asyncio.create_task(process_podcast_creation(
+            task_id,
+            file_path,
+            payload["model"],
+            payload["original_filename"],
+            payload["output_profiles"]
+        ))
+        lease_lost = False
+        while not run.done():
+            await asyncio.wait({run}, timeout=CHECK_SECONDS)
+            if run.done():
+                break
+            if not await asyncio.to_thread(queue.heartbeat, task_id, worker_id):
+                # The job was handed to another worker: stop, and leave its state alone
+                logger.warning(f"Worker {worker_id} lost the lease on task {task_id}")
+                lease_lost = True
+                run.cancel()
+            elif await asyncio.to_thread(queue.is_cancel_requested, task_id):
+                logger.info(f"Worker {worker_id} cancelling task {task_id}")
+                run.cancel()
+        try:
+            await run
+        except asyncio.CancelledError:
+            pass
+
+        if lease_lost:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            return
+        status = TASKS[task_id]
+        if status["status"] == "processing":
+            # Cancelled before the job got going
+            status.update(CANCELLED_STATUS)
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        if status["status"] == "completed":
+            await asyncio.to_thread(publish_podcast, task_id)
+        if await asyncio.to_thread(queue.finish, task_id, status, worker_id):
+            await asyncio.to_thread(store.delete, payload["file_key"])
+    finally:
+        TASKS.pop(task_id, None)
+        TASK_OWNERS.pop(task_id, None)
+
+async def release_abandoned_uploads() -> None:
+    """Delete stored uploads of jobs that ended without a worker (cancelled while
+    queued, or out of attempts)."""
+    store = get_artifact_store()
+    for payload in await asyncio.to_thread(get_job_queue().take_unreleased):
+        await asyncio.to_thread(store.delete, payload["file_key"])
+
+async def worker_loop(worker_id: str) -> None:
+    queue = get_job_queue()
+    logger.info(f"Worker {worker_id} started")
+    while True:
+        job = await asyncio.to_thread(queue.claim, worker_id)
+        if not job:
+            try:
+                await release_abandoned_uploads()
+            except Exception as e:
+                logger.error(f"Worker {worker_id} failed to release uploads: {e}", exc_info=True)
+            await asyncio.sleep(POLL_SECONDS)
+            continue
+        logger.info(f"Worker {worker_id} picked up task {job['task_id']}")
+        try:
+            await run_job(job, worker_id)
+        except Exception as e:
+            logger.error(f"Worker {worker_id} failed task {job['task_id']}: {e}", exc_info=True)
+            failed = {"status": "failed", "message": f"Error: {str(e)}", "progress": 0}
+            # finish() marks the upload released, so delete it here or it is never reclaimed
+            if await asyncio.to_thread(queue.finish, job["task_id"], failed, worker_id):
+                await asyncio.to_thread(get_artifact_store().delete, job["payload"]["file_key"])
+
+async def main(concurrency: int) -> None:
+    store = get_artifact_store()
+    # Share synthesized speech chunks (e.g. the pause between lines) across every worker node
+    podcast_generator.CHUNK_STORE = store
+    background = []
+    if store.local_path("") is not None:
+        # Published podcasts live on a filesystem store, so this node expires them
+        init_storage_index()
+        background.append(compaction_loop())
+    base_id = f"{socket.gethostname()}-{os.getpid()}"
+    await asyncio.gather(*background, *(worker_loop(f"{base_id}-{i}") for i in range(concurrency)))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run podcast jobs from the shared queue")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=int(os.getenv("WORKER_CONCURRENCY", 2)),
+        help="jobs run at once by this process"
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency))